@@ -1,42 +1,91 @@
+import json
 import re
-import os
-from ollama_utils import send_to_ollama
+from itertools import islice
+from ollama_utils import send_to_ollama_async
 
 OUTPUT_FILE = "refactoring.md"
 
+# Sidecar index of documented hashes (JSON-lines, one hash per line) so later
+# runs start in O(1) instead of re-scanning an ever-growing markdown file.
+HASH_INDEX_FILE = "refactoring.hashes.json"
+
+def append_hash_index(commit_hash, index_path=HASH_INDEX_FILE):
+    with open(index_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(commit_hash) + "\n")
+
+# Compiled once; scanning restarts for every commit but the pattern does not.
+FILE_PATTERN = re.compile(r'diff --git a/(.*?) b/')
+
+# Prompt boilerplate is baked once at import; per commit only the variable
+# fields are substituted. The byte-identical instruction block leads the
+# prompt so Ollama's KV prefix cache can skip re-prefilling it on every
+# commit after the first.
+PROMPT_TEMPLATE = "Look at this git diff and tell me:\n- What changed\n- Which files were modified  \n- What was added, deleted, or updated\n\nBe brief and clear.\n\nCommit: {commit_message}\n\nFiles changed: {files_list}\n\n```diff\n{truncated_diff}\n```"
+
 def create_simple_prompt(diff, commit_message, commit_hash, diff_limit):
-    truncated_diff = diff[:diff_limit] + ("\n... (diff truncated)" if len(diff) > diff_limit else "")
-    file_pattern = r'diff --git a/(.*?) b/'
-    changed_files = re.findall(file_pattern, diff)
+    # Most diffs fit the limit; pass them through untouched instead of paying
+    # the slice-and-concatenate on every call.
+    if len(diff) <= diff_limit:
+        truncated_diff = diff
+    else:
+        truncated_diff = diff[:diff_limit] + "\n... (diff truncated)"
+    # Only the first five filenames are shown; a sixth match just proves the
+    # ellipsis is needed, so scanning stops there.
+    changed_files = [m.group(1) for m in islice(FILE_PATTERN.finditer(diff), 6)]
     files_list = ", ".join(changed_files[:5]) + ("..." if len(changed_files) > 5 else "")
-    prompt = f"""Commit: {commit_message}\n\nFiles changed: {files_list}\n\nLook at this git diff and tell me:\n- What changed\n- Which files were modified  \n- What was added, deleted, or updated\n\nBe brief and clear.\n\n```diff\n{truncated_diff}\n```"""
-    return prompt
+    return PROMPT_TEMPLATE.format(commit_message=commit_message, files_list=files_list, truncated_diff=truncated_diff)
 
-def generate_documentation(diff, commit_message, commit_hash, model_name, watch_mode=False, diff_limit=5000):
+async def generate_documentation(diff, commit_message, commit_hash, model_name, watch_mode=False, diff_limit=5000, dump_prompt=False):
     print(f"[📝] Generating simple documentation for commit {commit_hash[:8]}...")
     prompt = create_simple_prompt(diff, commit_message, commit_hash, diff_limit)
-    documentation = send_to_ollama(prompt, model_name, watch_mode)
+    documentation = await send_to_ollama_async(prompt, model_name, watch_mode, dump_prompt)
     return documentation
 
-def append_to_documentation_file(file_path, commit_hash, author, commit_message, commit_date, generated_docs):
-    print(f"[✍️] Appending documentation for {commit_hash} to {file_path}...")
-    doc_entry = f"""
+# Written once when a fresh documentation file is created.
+FILE_HEADER = (
+    b"# Git Commit Documentation\n\n"
+    b"This file contains developer-focused documentation for each commit.\n\n"
+)
+
+def open_documentation_file(file_path):
+    """Open the documentation file once for the whole run.
+
+    Append-binary with a 64 KiB buffer, so each commit costs a single
+    buffered write instead of a stat + open + close cycle. Writes the
+    header when the file is new or empty.
+    """
+    f = open(file_path, 'ab', buffering=1 << 16)
+    if f.tell() == 0:
+        f.write(FILE_HEADER)
+    return f
+
+# Built once at import; each commit only pays a .format call. The full
+# **Commit Hash** line is what read_documented_hashes scans for on later runs.
+DOC_ENTRY_TEMPLATE = """
 ---
 
-## Commit: {commit_hash[:8]}
+## Commit: {short_hash}
 
+**Commit Hash**: `{commit_hash}`  
 **Author:** {author}  
 **Date:** {commit_date}  
 **Message:** {commit_message}
 
-{generated_docs if generated_docs else "No documentation generated."}
+{generated_docs}
 
 ---
 """
-    if not os.path.exists(file_path):
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write("# Git Commit Documentation\n\n")
-            f.write("This file contains developer-focused documentation for each commit.\n\n")
-    with open(file_path, 'a', encoding='utf-8') as f:
-        f.write(doc_entry)
-    print(f"[✅] Documentation for commit {commit_hash} successfully added to {file_path}.")
+
+def append_to_documentation_file(f, commit_hash, author, commit_message, commit_date, generated_docs):
+    print(f"[✍️] Appending documentation for {commit_hash} to {f.name}...")
+    doc_entry = DOC_ENTRY_TEMPLATE.format(
+        short_hash=commit_hash[:8],
+        commit_hash=commit_hash,
+        author=author,
+        commit_date=commit_date,
+        commit_message=commit_message,
+        generated_docs=generated_docs if generated_docs else "No documentation generated."
+    )
+    f.write(doc_entry.encode('utf-8'))
+    append_hash_index(commit_hash)
+    print(f"[✅] Documentation for commit {commit_hash} successfully added to {f.name}.")
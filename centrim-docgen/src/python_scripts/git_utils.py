@@ -1,13 +1,48 @@
 import os
+import shutil
 import subprocess
 import re
+from collections import defaultdict
+
+# Resolved once so subprocess does not re-walk $PATH for every git call.
+GIT_BIN = shutil.which('git') or 'git'
+
+# Compiled once at import; get_structured_commit_changes runs it per file.
+SYMBOL_PATTERN = re.compile(r'^@@.*?@@[ ]*(def |function |class )?([\w_]+)?', re.MULTILINE)
+
+# Splits a combined patch into per-file chunks on the diff --git headers.
+DIFF_HEADER_PATTERN = re.compile(r'^diff --git a/(.*?) b/(.*?)\n', re.MULTILINE)
+
+# Splits a file's patch into hunk blocks at each @@ header (lookahead keeps
+# the header with its hunk).
+HUNK_SPLIT_PATTERN = re.compile(r'(?=^@@)', re.MULTILINE)
+
+# One hash lookup per file instead of a branch ladder of string comparisons.
+EXT_TO_LANG = {
+    '.py': 'Python',
+    '.js': 'JavaScript',
+    '.jsx': 'JavaScript',
+    '.ts': 'TypeScript',
+    '.tsx': 'TypeScript',
+    '.go': 'Go',
+    '.rs': 'Rust',
+    '.php': 'PHP',
+    '.sql': 'SQL',
+    '.md': 'Documentation',
+    '.yml': 'Configuration',
+    '.yaml': 'Configuration',
+}
 
 def run_command(command, cwd=None):
+    # Capture raw bytes and decode once at the end; text=True would wrap the
+    # pipe in an incremental locale-dependent decoder that chokes on binary
+    # content inside diffs.
     try:
-        result = subprocess.run(command, capture_output=True, text=True, check=True, cwd=cwd)
-        return result.stdout.strip()
+        result = subprocess.run(command, capture_output=True, check=True, cwd=cwd)
+        return result.stdout.decode('utf-8', errors='replace').strip()
     except subprocess.CalledProcessError as e:
-        print(f"[❌] Command failed: {' '.join(command)}\n{e.stderr}")
+        stderr = e.stderr.decode('utf-8', errors='replace') if e.stderr else ''
+        print(f"[❌] Command failed: {' '.join(command)}\n{stderr}")
         return None
     except FileNotFoundError:
         print(f"[❌] Command not found: {command[0]}. Make sure Git is installed and in your PATH.")
@@ -16,52 +51,75 @@ def run_command(command, cwd=None):
         print(f"[❌] Error running command: {e}")
         return None
 
+def run_command_bounded(command, max_bytes=None, cwd=None):
+    """Stream a command's stdout through a pipe instead of buffering it all.
+
+    When max_bytes is given, reads one byte past the cap (so callers can tell
+    the output was truncated) and terminates the process instead of letting it
+    produce a multi-MB diff nobody will read.
+    """
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd)
+        if max_bytes is not None:
+            data = process.stdout.read(max_bytes + 1)
+            if len(data) > max_bytes:
+                process.terminate()
+        else:
+            data = process.stdout.read()
+        process.stdout.close()
+        process.wait()
+        return data.decode('utf-8', errors='replace').strip()
+    except FileNotFoundError:
+        print(f"[❌] Command not found: {command[0]}. Make sure Git is installed and in your PATH.")
+        return None
+    except Exception as e:
+        print(f"[❌] Error running command: {e}")
+        return None
+
 def get_structured_commit_changes(commit_hash, parent_hash=None, file_limit=20, hunk_limit=5, symbol_limit=5):
     if parent_hash is None:
         parent_hash = f"{commit_hash}~1"
-    name_status = run_command(["git", "diff", "--name-status", parent_hash, commit_hash])
-    if not name_status:
+    # One git process delivers the raw status lines and every file's hunks
+    # together, instead of a --name-status call plus one git diff per file.
+    combined = run_command([GIT_BIN, "diff", "--raw", "-U3", "--function-context", parent_hash, commit_hash])
+    if not combined:
         print(f"[❌] No changed files found for commit {commit_hash}")
         return {}
-    file_lines = name_status.splitlines()
-    file_summaries = []
-    for line in file_lines[:file_limit]:
-        parts = line.strip().split('\t')
+    # Raw header lines (":oldmode newmode oldsha newsha STATUS\tpath") come
+    # first; map path -> status, then split the patch body per file.
+    status_map = {}
+    patch_start = 0
+    for line in combined.splitlines(keepends=True):
+        if not line.startswith(':'):
+            break
+        patch_start += len(line)
+        parts = line.rstrip('\n').split('\t')
         if len(parts) < 2:
             continue
-        status, file_path = parts[0], parts[1]
+        meta = parts[0].split()
+        if meta:
+            status_map[parts[-1]] = meta[-1]
+    file_chunks = []
+    matches = list(DIFF_HEADER_PATTERN.finditer(combined, patch_start))
+    for i, match in enumerate(matches[:file_limit]):
+        chunk_end = matches[i + 1].start() if i + 1 < len(matches) else len(combined)
+        file_chunks.append((match.group(2), combined[match.start():chunk_end]))
+    file_summaries = []
+    for file_path, diff_hunks in file_chunks:
+        status = status_map.get(file_path, 'M')
         ext = os.path.splitext(file_path)[1].lower()
-        lang = None
-        if ext == '.py':
-            lang = 'Python'
-        elif ext in ['.js', '.jsx']:
-            lang = 'JavaScript'
-        elif ext in ['.ts', '.tsx']:
-            lang = 'TypeScript'
-        elif ext == '.go':
-            lang = 'Go'
-        elif ext == '.rs':
-            lang = 'Rust'
-        elif ext == '.php':
-            lang = 'PHP'
-        elif ext == '.sql':
-            lang = 'SQL'
-        elif ext in ['.md']:
-            lang = 'Documentation'
-        elif ext in ['.yml', '.yaml']:
-            lang = 'Configuration'
-        else:
-            lang = ext[1:].upper() if ext else 'Other'
-        if lang in ['Other', '']:
+        lang = EXT_TO_LANG.get(ext, ext[1:].upper() if ext else 'Other')
+        if lang in ('Other', ''):
             continue
-        diff_hunks = run_command([
-            "git", "diff", "-U3", "--function-context", parent_hash, commit_hash, "--", file_path
-        ])
         if not diff_hunks:
             continue
-        symbol_pattern = re.compile(r'^@@.*?@@[ ]*(def |function |class )?([\w_]+)?', re.MULTILINE)
         symbols = []
-        for match in symbol_pattern.finditer(diff_hunks):
+        # One split pass yields the hunk blocks directly instead of a str.find
+        # scan per symbol to locate each hunk's end.
+        for hunk in HUNK_SPLIT_PATTERN.split(diff_hunks):
+            match = SYMBOL_PATTERN.match(hunk)
+            if not match:
+                continue
             symbol_type = 'unknown'
             if match.group(1):
                 if 'def' in match.group(1):
@@ -71,11 +129,6 @@ def get_structured_commit_changes(commit_hash, parent_hash=None, file_limit=20,
                 elif 'function' in match.group(1):
                     symbol_type = 'function'
             symbol_name = match.group(2) or ''
-            hunk_start = match.start()
-            hunk_end = diff_hunks.find('@@', hunk_start + 2)
-            if hunk_end == -1:
-                hunk_end = len(diff_hunks)
-            hunk = diff_hunks[hunk_start:hunk_end]
             symbols.append({
                 'type': symbol_type,
                 'name': symbol_name,
@@ -90,41 +143,158 @@ def get_structured_commit_changes(commit_hash, parent_hash=None, file_limit=20,
             'changed_symbols': symbols[:symbol_limit],
             'diff_summary': diff_hunks[:2000] + ('\n... (truncated)' if len(diff_hunks) > 2000 else '')
         })
-    lang_map = {}
+    lang_map = defaultdict(list)
     for f in file_summaries:
-        lang_map.setdefault(f['language'], []).append(f)
-    return lang_map
+        lang_map[f['language']].append(f)
+    return dict(lang_map)
 
-def get_recent_commit_info(num_commits):
-    print(f"[🔍] Fetching info for the last {num_commits} commits...")
-    commit_info_raw = run_command(["git", "log", f"-{num_commits}", "--pretty=format:%H%n%an%n%s%n%ad", "--date=iso-strict", "--reverse"])
+def get_recent_commit_info(num_commits, since_hash=None):
+    # Field/record separators (unit/record separator control chars) instead of
+    # newlines, so commit subjects containing newlines cannot desync the parser.
+    log_format = "--pretty=format:%H%x1f%an%x1f%s%x1f%ad%x1e"
+    if since_hash:
+        print(f"[🔍] Fetching commits since {since_hash[:8]}...")
+        commit_info_raw = run_command([GIT_BIN, "log", f"{since_hash}..HEAD", log_format, "--date=iso-strict", "--reverse"])
+        if commit_info_raw is None:
+            # The documented hash may no longer exist (rebase, different clone);
+            # fall back to the plain last-N fetch.
+            print(f"[⚠️] Could not walk history from {since_hash[:8]}. Falling back to the last {num_commits} commit(s).")
+            return get_recent_commit_info(num_commits)
+        if not commit_info_raw:
+            print("[ℹ️] No new commits since the last documented one.")
+            return []
+    else:
+        print(f"[🔍] Fetching info for the last {num_commits} commits...")
+        commit_info_raw = run_command([GIT_BIN, "log", f"-{num_commits}", log_format, "--date=iso-strict", "--reverse"])
     commits = []
     if commit_info_raw:
-        lines = commit_info_raw.split('\n')
-        for i in range(0, len(lines), 4):
-            if i + 3 < len(lines):
-                commit_hash = lines[i]
-                author = lines[i+1]
-                message = lines[i+2]
-                date = lines[i+3]
-                commits.append((commit_hash, author, message, date))
-                print(f"[✅] Fetched commit: {commit_hash} by {author}")
+        for record in commit_info_raw.split('\x1e'):
+            record = record.strip()
+            if not record:
+                continue
+            commit_hash, author, message, date = record.split('\x1f')
+            commits.append((commit_hash, author, message, date))
+        print(f"[✅] Fetched {len(commits)} commit(s).")
     else:
         print("[❌] Could not fetch recent commit info.")
     return commits
 
-def get_git_diff(commit_hash):
+def get_recent_commit_diffs(num_commits, since_hash=None, diff_limit=None):
+    """Fetch commit info and patches for all wanted commits in one git process.
+
+    One `git log -p` replaces a `git diff` fork per commit. Records start with
+    an %x1e sentinel, header fields are %x1f-separated, and everything up to
+    the next sentinel is that commit's patch. Each patch is capped just past
+    diff_limit while streaming so an enormous diff cannot balloon memory (the
+    prompt builder's `len(diff) > diff_limit` truncation check still fires).
+
+    Returns a list of (hash, author, message, date, diff) tuples.
+    """
+    command = [GIT_BIN, "log", "--reverse", "-p", "--date=iso-strict", "--pretty=format:%x1e%H%x1f%an%x1f%s%x1f%ad%x1f"]
+    if since_hash:
+        print(f"[🔍] Fetching commits and diffs since {since_hash[:8]}...")
+        command.insert(2, f"{since_hash}..HEAD")
+    else:
+        print(f"[🔍] Fetching info and diffs for the last {num_commits} commits...")
+        command.insert(2, f"-{num_commits}")
+    commits = []
+    current = None
+
+    def finalize(entry):
+        commit_hash, author, message, date, diff_parts = entry
+        commits.append((commit_hash, author, message, date, "".join(diff_parts).strip()))
+
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   text=True, errors='replace')
+        diff_len = 0
+        for line in process.stdout:
+            if line.startswith('\x1e'):
+                if current is not None:
+                    finalize(current)
+                commit_hash, author, message, date, first_diff = line[1:].split('\x1f')
+                current = (commit_hash, author, message, date, [first_diff])
+                diff_len = len(first_diff)
+            elif current is not None and (diff_limit is None or diff_len <= diff_limit):
+                current[4].append(line)
+                diff_len += len(line)
+        if current is not None:
+            finalize(current)
+        process.stdout.close()
+        if process.wait() != 0:
+            stderr = process.stderr.read()
+            print(f"[❌] Command failed: {' '.join(command)}\n{stderr}")
+            return None
+        print(f"[✅] Fetched {len(commits)} commit(s) with diffs.")
+        return commits
+    except FileNotFoundError:
+        print(f"[❌] Command not found: {command[0]}. Make sure Git is installed and in your PATH.")
+        return None
+    except Exception as e:
+        print(f"[❌] Error running command: {e}")
+        return None
+
+def get_git_diff(commit_hash, max_bytes=None):
     print(f"[🔍] Fetching git diff for commit {commit_hash}...")
-    diff = run_command(["git", "diff", f"{commit_hash}~1", commit_hash])
+    diff = run_command_bounded([GIT_BIN, "diff", f"{commit_hash}~1", commit_hash], max_bytes=max_bytes)
     if diff:
         print(f"[✅] Diff fetched ({len(diff)} characters).")
     else:
         print("[ℹ️] No diff found for this commit (e.g., initial commit or merge commit without changes).")
     return diff
 
+class GitCatFileBatch:
+    """One long-lived `git cat-file --batch` process for blob reads.
+
+    Each lookup writes a `<rev>:<path>` request line and reads the sized
+    reply, so N file fetches cost one fork+exec instead of N. The process
+    is started lazily and restarted if it dies.
+    """
+
+    def __init__(self, cwd=None):
+        self._process = None
+        self._cwd = cwd
+
+    def _ensure_process(self):
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                [GIT_BIN, "cat-file", "--batch"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                cwd=self._cwd,
+            )
+        return self._process
+
+    def read(self, rev, file_path):
+        try:
+            process = self._ensure_process()
+            process.stdin.write(f"{rev}:{file_path}\n".encode('utf-8'))
+            process.stdin.flush()
+            header = process.stdout.readline().split()
+            # A found object answers "<sha> <type> <size>"; anything else
+            # ("<rev> missing", "... ambiguous") means no content.
+            if len(header) != 3:
+                return None
+            size = int(header[2])
+            content = process.stdout.read(size)
+            process.stdout.read(1)  # trailing newline after the body
+            return content.decode('utf-8', errors='replace')
+        except (OSError, ValueError):
+            self.close()
+            return None
+
+    def close(self):
+        if self._process is not None:
+            try:
+                self._process.stdin.close()
+                self._process.wait(timeout=5)
+            except Exception:
+                self._process.kill()
+            self._process = None
+
+_cat_file_batch = GitCatFileBatch()
+
 def get_file_content_before_commit(file_path, commit_hash):
-    try:
-        content = run_command(["git", "show", f"{commit_hash}~1:{file_path}"])
-        return content if content else ""
-    except:
-        return ""
+    content = _cat_file_batch.read(f"{commit_hash}~1", file_path)
+    return content if content else ""
@@ -1,24 +1,79 @@
 import argparse
+import asyncio
+import hashlib
+import json
+import mmap
 import os
-from git_utils import get_recent_commit_info, get_git_diff
-from ollama_utils import check_ollama_status, ensure_model_available
-from docgen import generate_documentation, append_to_documentation_file, OUTPUT_FILE
+import re
+from git_utils import get_recent_commit_diffs
+from ollama_utils import check_ollama_status, ensure_model_available, set_generate_concurrency, warm_up_model
+from docgen import generate_documentation, append_to_documentation_file, open_documentation_file, OUTPUT_FILE, HASH_INDEX_FILE
 
-def read_documented_hashes(file_path):
-    documented_hashes = set()
-    if os.path.exists(file_path):
+# Bytes pattern so the scan runs over the mmap'd file without decoding it.
+HASH_PATTERN = re.compile(rb"\*\*Commit Hash\*\*: `([0-9a-f]{7,40})`")
+
+def _load_hash_index(index_path):
+    """Read the JSON-lines sidecar index; None if missing or unreadable."""
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except (OSError, ValueError):
+        return None
+
+def read_documented_hashes(file_path, file_exists=None, index_path=HASH_INDEX_FILE):
+    """Return (documented_hashes, last_documented_hash).
+
+    The sidecar index is consulted first so startup stays O(1) as the markdown
+    file grows; the mmap scan of the markdown remains as bootstrap/fallback
+    and seeds the sidecar for the next run. The file is appended
+    chronologically, so the last hash seen is the newest documented commit and
+    can seed a `git log <hash>..HEAD` fetch. Callers that have already
+    stat'ed the file can pass file_exists to skip a second stat.
+    """
+    if index_path:
+        indexed = _load_hash_index(index_path)
+        if indexed is not None:
+            print(f"[✅] Found {len(indexed)} documented hashes in {index_path}.")
+            return frozenset(indexed), (indexed[-1] if indexed else None)
+    documented_hashes = frozenset()
+    last_documented_hash = None
+    if file_exists is None:
+        file_exists = os.path.exists(file_path)
+    if file_exists:
         print(f"[🔍] Reading existing documentation from {file_path}...")
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                if line.startswith("**Commit Hash**: `"):
-                    hash_val = line.replace("**Commit Hash**: `", "").replace("`", "").strip()
-                    documented_hashes.add(hash_val)
+        # One regex pass over the memory-mapped file instead of a Python-level
+        # line loop; on a doc file with thousands of entries the scan stays in C.
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    matches = HASH_PATTERN.findall(mm)
+                documented_hashes = frozenset(m.decode('ascii') for m in matches)
+                if matches:
+                    last_documented_hash = matches[-1].decode('ascii')
+                    if index_path:
+                        # Seed the sidecar so the next run skips this scan.
+                        with open(index_path, 'w', encoding='utf-8') as idx:
+                            idx.writelines(json.dumps(m.decode('ascii')) + "\n" for m in matches)
         print(f"[✅] Found {len(documented_hashes)} existing documented hashes.")
     else:
         print(f"[ℹ️] Documentation file '{file_path}' not found. A new one will be created if needed.")
-    return documented_hashes
+    return documented_hashes, last_documented_hash
 
-def handle_generate_docs(args):
+async def process_commit(commit_hash, commit_message, diff, model_to_use, args):
+    # Empty-diff commits are filtered out before tasks are created, so a None
+    # result from this coroutine always means the generation itself failed.
+    print(f"\n--- Processing new commit: {commit_hash} ---")
+    return await generate_documentation(
+        diff,
+        commit_message,
+        commit_hash,
+        model_to_use,
+        args.watch,
+        args.diff_limit,
+        args.dump_prompt
+    )
+
+async def handle_generate_docs(args):
     if not check_ollama_status():
         print("[🛑] Ollama server is not running. Please start it to proceed.")
         return
@@ -26,47 +81,105 @@ def handle_generate_docs(args):
     if not ensure_model_available(model_to_use):
         print(f"[🛑] Model '{model_to_use}' is not available and could not be pulled. Exiting.")
         return
+    # Kick off the model load now so it overlaps the git fetch below.
+    warm_up_model(model_to_use)
+    set_generate_concurrency(args.concurrency)
+    if args.concurrency > 1 and not os.environ.get("OLLAMA_NUM_PARALLEL"):
+        print(f"[⚠️] OLLAMA_NUM_PARALLEL is not set on this shell; the Ollama server "
+              f"defaults to serial generation. Export OLLAMA_NUM_PARALLEL={args.concurrency} "
+              "before starting the server to actually overlap generations.")
     print("🚀 Starting Simple Git Documentation Generator 🚀")
-    num_diffs_to_process = 1 
+    # The existence state only changes when we write the file ourselves, so
+    # stat it once per run instead of in every helper.
+    output_file_exists = os.path.exists(OUTPUT_FILE)
+    num_diffs_to_process = 1
     if args.diffno is not None:
         num_diffs_to_process = args.diffno
         print(f"[⚙️] Processing {num_diffs_to_process} diff(s) as specified by --diffno.")
-    elif not os.path.exists(OUTPUT_FILE):
-        num_diffs_to_process = 5 
+    elif not output_file_exists:
+        num_diffs_to_process = 5
         print(f"[⚙️] No existing documentation file found. Defaulting to processing the last {num_diffs_to_process} diffs.")
     else:
         print(f"[⚙️] Existing documentation file found. Defaulting to processing only the latest diff.")
-    recent_commits = get_recent_commit_info(num_diffs_to_process)
+    documented_hashes, last_documented_hash = read_documented_hashes(OUTPUT_FILE, file_exists=output_file_exists)
+    # On repeat runs ask git only for commits newer than the last documented one
+    # instead of re-fetching and re-filtering the last N. An explicit --diffno
+    # keeps the fixed-count behaviour.
+    since_hash = last_documented_hash if args.diffno is None else None
+    # One git process fetches commit info and all patches together.
+    recent_commits = get_recent_commit_diffs(num_diffs_to_process, since_hash=since_hash, diff_limit=args.diff_limit)
+    if recent_commits is None and since_hash:
+        # The documented hash may no longer exist (rebase, fresh clone).
+        recent_commits = get_recent_commit_diffs(num_diffs_to_process, diff_limit=args.diff_limit)
     if not recent_commits:
-        print("[🛑] Exiting: Could not get any commit information.")
+        print("[🛑] Exiting: No new commit information to process.")
         return
-    documented_hashes = read_documented_hashes(OUTPUT_FILE)
-    for commit_hash, author, commit_message, commit_date in recent_commits:
-        if commit_hash in documented_hashes:
-            print(f"[ℹ️] Commit {commit_hash} is already documented in {OUTPUT_FILE}. Skipping.")
-            continue
-        print(f"\n--- Processing new commit: {commit_hash} ---")
-        diff = get_git_diff(commit_hash)
-        if not diff:
-            print(f"[ℹ️] No significant diff found for commit {commit_hash}. Skipping documentation generation.")
+    new_commits = []
+    for commit in recent_commits:
+        if commit[0] in documented_hashes:
+            print(f"[ℹ️] Commit {commit[0]} is already documented in {OUTPUT_FILE}. Skipping.")
             continue
-        generated_docs = generate_documentation(
-            diff,
-            commit_message,
-            commit_hash,
-            model_to_use,
-            args.watch,
-            args.diff_limit
-        )
-        if not generated_docs:
-            print(f"[❌] Failed to generate documentation from Ollama for commit {commit_hash}. Please check Ollama server and model.")
+        # Merge/empty commits carry no diff: skip them here so they neither
+        # collide in the diff dedupe below nor get reported as failures.
+        if not commit[4]:
+            print(f"[ℹ️] No significant diff found for commit {commit[0]}. Skipping documentation generation.")
             continue
-        append_to_documentation_file(OUTPUT_FILE, commit_hash, author, commit_message, commit_date, generated_docs)
+        new_commits.append(commit)
+    # Fire one generation task per commit; Ollama overlaps them up to OLLAMA_NUM_PARALLEL.
+    # Commits whose diff text is byte-identical to an earlier one (cherry-picks,
+    # re-applied reverts) share that commit's task instead of querying the model
+    # again; slot_of_commit maps each commit to its result index.
+    tasks = []
+    slot_of_commit = []
+    seen_diffs = {}
+    for commit_hash, author, commit_message, commit_date, diff in new_commits:
+        key = hashlib.sha256(diff.encode('utf-8')).digest()
+        slot = seen_diffs.get(key)
+        if slot is None:
+            slot = len(tasks)
+            seen_diffs[key] = slot
+            tasks.append(process_commit(commit_hash, commit_message, diff, model_to_use, args))
+        else:
+            print(f"[ℹ️] Commit {commit_hash[:8]} has the same diff as an earlier commit in this run. Reusing its documentation.")
+        slot_of_commit.append(slot)
+    # Watch mode streams raw tokens and preambles straight to stdout, so
+    # overlapping generations would interleave into garbage; run them one at
+    # a time. The same ordered loop covers the common single-task re-run,
+    # which skips gather's future bookkeeping either way.
+    if args.watch or len(tasks) == 1:
+        results = []
+        for task in tasks:
+            try:
+                results.append(await task)
+            except Exception as e:
+                results.append(e)
+    else:
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    # Append in commit order once everything has finished, so the file stays
+    # chronological. The file is opened once (lazily, so a run with no output
+    # does not create it) and every entry is a single buffered write.
+    doc_file = None
+    try:
+        for (commit_hash, author, commit_message, commit_date, diff), slot in zip(new_commits, slot_of_commit):
+            generated_docs = results[slot]
+            if isinstance(generated_docs, Exception):
+                print(f"[❌] Documentation task for commit {commit_hash} failed: {generated_docs}")
+                continue
+            if not generated_docs:
+                print(f"[❌] Failed to generate documentation from Ollama for commit {commit_hash}. Please check Ollama server and model.")
+                continue
+            if doc_file is None:
+                doc_file = open_documentation_file(OUTPUT_FILE)
+            append_to_documentation_file(doc_file, commit_hash, author, commit_message, commit_date, generated_docs)
+    finally:
+        if doc_file is not None:
+            doc_file.close()
     print("\n🎉 Documentation Generation Complete! 🎉")
 
 def main():
     parser = argparse.ArgumentParser(
         description="Generate simple Git commit documentation using Ollama.",
+        epilog="Commits are documented concurrently; set the OLLAMA_NUM_PARALLEL environment\nvariable on the Ollama server to control how many generations run in parallel.",
         formatter_class=argparse.RawTextHelpFormatter
     )
     parser.add_argument(
@@ -85,13 +198,24 @@ def main():
         default=6000,
         help="Character limit for Git diff content sent to the AI model.\nPrevents model overload with very large diffs. (Default: 6000)"
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Maximum documentation generations in flight at once. (Default: 4)\nMatch OLLAMA_NUM_PARALLEL on the server for real parallelism."
+    )
     parser.add_argument(
         "--watch",
         action="store_true",
         help="Watch raw streaming output from Ollama during generation."
     )
+    parser.add_argument(
+        "--dump-prompt",
+        action="store_true",
+        help="With --watch, echo the full prompt instead of its length and hash."
+    )
     args = parser.parse_args()
-    handle_generate_docs(args)
+    asyncio.run(handle_generate_docs(args))
 
 if __name__ == "__main__":
     main()
@@ -1,18 +1,93 @@
+import asyncio
+import hashlib
+import httpx
 import requests
 import subprocess
 import sys
 import json
+import threading
+import time
+from spinner import progress_tick, progress_reset
+
+# orjson decodes the newline-delimited JSON token stream several times faster
+# than the stdlib; fall back to json when the wheel is not installed. Both
+# dumps variants produce UTF-8 bytes without \uXXXX escaping, which would
+# inflate non-ASCII diff content up to 6x.
+try:
+    import orjson
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+except ImportError:
+    json_loads = json.loads
+    def json_dumps(obj):
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
 
 OLLAMA_URL = "http://localhost:11434"
 OLLAMA_GENERATE_URL = f"{OLLAMA_URL}/api/generate"
 OLLAMA_TAGS_URL = f"{OLLAMA_URL}/api/tags"
+OLLAMA_PULL_URL = f"{OLLAMA_URL}/api/pull"
+OLLAMA_SHOW_URL = f"{OLLAMA_URL}/api/show"
+
+# One pooled session for the synchronous endpoints (status check, model listing)
+# so repeated calls reuse a warm keep-alive socket instead of paying a TCP
+# handshake each time.
+SESSION = requests.Session()
+SESSION.headers.update({"Connection": "keep-alive", "Accept-Encoding": "gzip, deflate"})
+_adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=0)
+SESSION.mount("http://", _adapter)
+SESSION.mount("https://", _adapter)
+
+# One shared async client so concurrent generations reuse the same connection pool.
+# http2=True lets concurrent generation streams multiplex over a single socket
+# (httpx falls back to HTTP/1.1 if the server does not negotiate it). How many
+# generations Ollama actually runs at once is governed by the server's
+# OLLAMA_NUM_PARALLEL environment variable (default 1); extra requests queue there.
+ASYNC_CLIENT = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=40, max_connections=100, keepalive_expiry=30.0),
+    timeout=httpx.Timeout(300.0, connect=10.0)
+)
+
+# Once the server has answered successfully we don't re-probe it for the rest
+# of the process; a crash mid-run surfaces through the generate calls anyway.
+_server_confirmed = False
+
+# Model list changes rarely; cache it briefly so library-style callers that
+# invoke ensure_model_available per commit don't refetch /api/tags every time.
+MODELS_CACHE_TTL = 60
+_models_cache = {"time": 0.0, "models": None}
+
+# Models confirmed present in this process; lets ensure_model_available skip
+# even the cached list lookup on repeat calls.
+_confirmed_models = set()
+
+# Caps in-flight generation requests so a large --diffno run cannot dogpile
+# the server; requests beyond the server's OLLAMA_NUM_PARALLEL would only
+# queue there and hold sockets open.
+GENERATE_CONCURRENCY = 4
+_generate_semaphore = asyncio.Semaphore(GENERATE_CONCURRENCY)
+
+def set_generate_concurrency(limit):
+    """Resize the client-side generation cap (e.g. from --concurrency).
+
+    Only useful above the server's OLLAMA_NUM_PARALLEL if that is raised
+    too; callers should mirror the two settings.
+    """
+    global GENERATE_CONCURRENCY, _generate_semaphore
+    if limit and limit > 0 and limit != GENERATE_CONCURRENCY:
+        GENERATE_CONCURRENCY = limit
+        _generate_semaphore = asyncio.Semaphore(limit)
 
 def check_ollama_status():
+    global _server_confirmed
+    if _server_confirmed:
+        return True
     print(f"[⚙️] Checking Ollama server status at {OLLAMA_URL}...")
     try:
-        response = requests.get(OLLAMA_URL, timeout=5)
+        response = SESSION.get(OLLAMA_URL, timeout=5)
         if response.status_code == 200:
             print("[✅] Ollama server is running.")
+            _server_confirmed = True
             return True
         else:
             print(f"[❌] Ollama server responded with status code {response.status_code}.")
@@ -31,26 +106,72 @@ def check_ollama_status():
         return False
 
 def get_available_ollama_models():
+    now = time.monotonic()
+    if _models_cache["models"] is not None and now - _models_cache["time"] < MODELS_CACHE_TTL:
+        return _models_cache["models"]
     try:
-        response = requests.get(OLLAMA_TAGS_URL, timeout=10)
+        response = SESSION.get(OLLAMA_TAGS_URL, timeout=10)
         response.raise_for_status()
         data = response.json()
-        models = [m['name'].split(':')[0] for m in data.get('models', [])]
-        return sorted(list(set(models)))
+        # One pass: dedupe while extracting; partition stops at the first ':'.
+        models = sorted({m['name'].partition(':')[0] for m in data.get('models', [])})
+        _models_cache["time"] = now
+        _models_cache["models"] = models
+        return models
     except requests.exceptions.RequestException as e:
         print(f"[❌] Error fetching Ollama models: {e}")
         return []
 
 def pull_ollama_model(model_name):
     print(f"[⬇️] Attempting to pull model '{model_name}'. This may take some time...")
+    # Pull over the HTTP API we already talk to instead of forking the ollama
+    # CLI; the NDJSON stream carries status and byte progress.
+    try:
+        response = SESSION.post(OLLAMA_PULL_URL, json={"name": model_name}, stream=True, timeout=None)
+        response.raise_for_status()
+        last_status = None
+        for line in response.iter_lines():
+            if not line:
+                continue
+            try:
+                data = json_loads(line)
+            except ValueError:
+                continue
+            if data.get("error"):
+                print(f"[❌] Failed to pull model '{model_name}'. Error: {data['error']}")
+                return False
+            status = data.get("status", "")
+            completed = data.get("completed")
+            total = data.get("total")
+            if completed is not None and total:
+                sys.stdout.write(f"\r[⬇️] {status}: {completed * 100 // total}% ({completed}/{total} bytes)")
+                sys.stdout.flush()
+            elif status and status != last_status:
+                sys.stdout.write(f"\n[⬇️] {status}")
+                sys.stdout.flush()
+            last_status = status
+        sys.stdout.write("\n")
+        print(f"[✅] Model '{model_name}' pulled successfully.")
+        # The cached model list is stale now that a new model exists.
+        _models_cache["models"] = None
+        return True
+    except requests.exceptions.RequestException as e:
+        print(f"[⚠️] HTTP pull failed ({e}). Falling back to the ollama CLI...")
+        return _pull_ollama_model_cli(model_name)
+    except Exception as e:
+        print(f"[❌] An unexpected error occurred during model pull: {e}")
+        return False
+
+def _pull_ollama_model_cli(model_name):
     try:
-        pull_process = subprocess.run(
+        subprocess.run(
             ["ollama", "pull", model_name],
             capture_output=False,
             text=True,
             check=True
         )
         print(f"[✅] Model '{model_name}' pulled successfully.")
+        _models_cache["models"] = None
         return True
     except subprocess.CalledProcessError as e:
         print(f"[❌] Failed to pull model '{model_name}'. Error: {e}")
@@ -67,68 +188,152 @@ def ensure_model_available(model_name):
     if not model_name:
         print("[❌] No model specified.")
         return False
+    if model_name in _confirmed_models:
+        return True
     print(f"[⚙️] Checking if model '{model_name}' is available...")
-    available_models = get_available_ollama_models()
-    if model_name in available_models:
+    # /api/show answers for one model in O(1) bytes; /api/tags would download
+    # metadata for every installed model just for an `in` check.
+    try:
+        response = SESSION.post(OLLAMA_SHOW_URL, json={"name": model_name}, timeout=5)
+        model_present = response.status_code == 200
+    except requests.exceptions.RequestException as e:
+        print(f"[❌] Error checking model '{model_name}': {e}")
+        model_present = False
+    if model_present:
         print(f"[✅] Model '{model_name}' is available.")
+        _confirmed_models.add(model_name)
         return True
     else:
         print(f"[⚠️] Model '{model_name}' not found locally. Attempting to pull...")
-        return pull_ollama_model(model_name)
+        if pull_ollama_model(model_name):
+            _confirmed_models.add(model_name)
+            return True
+        return False
 
-def send_to_ollama(prompt, model_name, watch_mode=False):
+def warm_up_model(model_name):
+    """Start loading the model in the background.
+
+    An empty-prompt generate returns as soon as the weights are resident,
+    so firing it on a daemon thread overlaps the cold-start load (seconds
+    for 7B+ models) with the git fetch that follows; the first real prompt
+    then hits a warm model. Failures are ignored — the real generate calls
+    report their own errors.
+    """
+    def _warm():
+        try:
+            SESSION.post(
+                OLLAMA_GENERATE_URL,
+                json={"model": model_name, "prompt": "", "stream": False, "keep_alive": "10m"},
+                timeout=120,
+            )
+        except requests.exceptions.RequestException:
+            pass
+    threading.Thread(target=_warm, daemon=True).start()
+
+async def send_to_ollama_async(prompt, model_name, watch_mode=False, dump_prompt=False):
     status_message_prefix = " [🤖] Querying Ollama for documentation..."
+    # Each status preamble is a single write+flush; the token stream below
+    # already batches its own flushes, so no other per-chunk syscalls remain.
     if not watch_mode:
         sys.stdout.write(status_message_prefix + ' ' * 40 + '\r')
-        sys.stdout.flush()
     else:
-        sys.stdout.write(status_message_prefix + '\n')
-        sys.stdout.flush()
-        sys.stdout.write("--- Ollama Raw Output Start ---\n")
-        sys.stdout.write(f"Prompt sent:\n---\n{prompt}\n---\n")
-        sys.stdout.flush()
+        # Identify the prompt by length + hash by default; echoing the full
+        # prompt (up to --diff-limit chars per commit) makes the terminal
+        # re-render megabytes on big runs, so the dump is opt-in.
+        if dump_prompt:
+            prompt_line = f"Prompt sent:\n---\n{prompt}\n---\n"
+        else:
+            digest = hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:12]
+            prompt_line = f"Prompt sent (len={len(prompt)} sha1={digest})\n"
+        sys.stdout.write(
+            f"{status_message_prefix}\n"
+            "--- Ollama Raw Output Start ---\n"
+            f"{prompt_line}"
+        )
+    sys.stdout.flush()
     payload = {
         "model": model_name,
         "prompt": prompt,
-        "stream": True
+        "stream": True,
+        # Keep the model resident between requests so a multi-commit run loads
+        # the weights once instead of once per prompt.
+        "keep_alive": "10m"
     }
-    output = ""
+    # Accumulate streamed tokens in a list; one join at the end avoids the
+    # O(n^2) byte copies of repeated string concatenation.
+    parts = []
+    # Watch-mode output is batched (~32 ms or 16 tokens) so a slow terminal's
+    # per-token flush syscalls don't throttle the stream.
+    pending = []
+    last_flush = time.monotonic()
     try:
-        response = requests.post(OLLAMA_GENERATE_URL, json=payload, stream=True, timeout=300)
-        response.raise_for_status()
-        for line in response.iter_lines():
-            if line:
-                decoded = line.decode('utf-8')
-                try:
-                    data = json.loads(decoded)
-                    if data.get("done"):
+        # Serialize the payload once ourselves (orjson when available) rather
+        # than letting httpx run stdlib json with ASCII escaping over the
+        # diff-sized prompt.
+        body = json_dumps(payload)
+        async with _generate_semaphore:
+            async with ASYNC_CLIENT.stream(
+                "POST", OLLAMA_GENERATE_URL, content=body,
+                headers={"Content-Type": "application/json"}
+            ) as response:
+                response.raise_for_status()
+                # Split the NDJSON stream on raw newlines and hand the bytes
+                # straight to the JSON decoder; aiter_lines would decode every
+                # chunk to str first just for the decoder to walk it again.
+                done = False
+                buffer = b""
+                async for chunk in response.aiter_bytes():
+                    if done:
                         break
-                    response_part = data.get("response", "")
-                    output += response_part
-                    if watch_mode:
-                        sys.stdout.write(response_part)
-                        sys.stdout.flush()
-                except json.JSONDecodeError:
-                    sys.stdout.write(f"\n[⚠️] Could not decode JSON line: {decoded}\n")
-                    sys.stdout.flush()
-                    output += decoded
+                    buffer += chunk
+                    lines = buffer.split(b"\n")
+                    buffer = lines.pop()
+                    for line in lines:
+                        if not line:
+                            continue
+                        try:
+                            data = json_loads(line)
+                            if data.get("done"):
+                                done = True
+                                break
+                            response_part = data.get("response", "")
+                            parts.append(response_part)
+                            if watch_mode:
+                                pending.append(response_part)
+                                now = time.monotonic()
+                                if now - last_flush > 0.032 or len(pending) > 16:
+                                    sys.stdout.write("".join(pending))
+                                    sys.stdout.flush()
+                                    pending.clear()
+                                    last_flush = now
+                            else:
+                                progress_tick()
+                        except ValueError:
+                            decoded = line.decode('utf-8', errors='replace')
+                            sys.stdout.write(f"\n[⚠️] Could not decode JSON line: {decoded}\n")
+                            sys.stdout.flush()
+                            parts.append(decoded)
+        if pending:
+            sys.stdout.write("".join(pending))
+            sys.stdout.flush()
+            pending.clear()
         if not watch_mode:
+            # Start the next generation's token count from zero.
+            progress_reset()
             sys.stdout.write(f"\r{status_message_prefix} [✅] Ollama response received.\n")
-            sys.stdout.flush()
         else:
-            sys.stdout.write("\n--- Ollama Raw Output End ---\n")
-            sys.stdout.write("[✅] Ollama response received.\n")
-            sys.stdout.flush()
-        return output.strip()
-    except requests.exceptions.ConnectionError as e:
+            sys.stdout.write("\n--- Ollama Raw Output End ---\n[✅] Ollama response received.\n")
+        sys.stdout.flush()
+        return "".join(parts).strip()
+    except httpx.ConnectError as e:
         sys.stdout.write(f"\r{status_message_prefix} [❌] Error connecting to Ollama: {e}\n")
         sys.stdout.flush()
         return None
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         sys.stdout.write(f"\r{status_message_prefix} [❌] Ollama request timed out after {300} seconds.\n")
         sys.stdout.flush()
         return None
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         sys.stdout.write(f"\r{status_message_prefix} [❌] Ollama API Request Error: {e}\n")
         sys.stdout.flush()
         return None
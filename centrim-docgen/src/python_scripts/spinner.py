@@ -1,28 +1,35 @@
 import sys
-import threading
-import itertools
-import time
 
-spinner_running = False
-spinner_thread = None
+# Frame prefixes are prebuilt so a redraw only formats the token count;
+# the & 3 index relies on there being exactly four frames.
+FRAMES = [' [🤖] Generating... -', ' [🤖] Generating... \\', ' [🤖] Generating... |', ' [🤖] Generating... /']
 
-def spinner_animation():
-    spinner_chars = itertools.cycle(['-', '\\', '|', '/'])
-    while spinner_running:
-        sys.stdout.write(next(spinner_chars) + '\r')
-        sys.stdout.flush()
-        time.sleep(0.1)
+# How many ticks between line redraws; keeps terminal writes off the hot path.
+TICKS_PER_FRAME = 8
 
-def start_spinner():
-    global spinner_running, spinner_thread
-    spinner_running = True
-    spinner_thread = threading.Thread(target=spinner_animation)
-    spinner_thread.daemon = True
-    spinner_thread.start()
+_tick_count = 0
 
-def stop_spinner():
-    global spinner_running, spinner_thread
-    if spinner_running:
-        spinner_running = False
-        if spinner_thread and spinner_thread.is_alive():
-            spinner_thread.join(timeout=0.2)
+# \r redraws are pure noise when stdout is piped (CI, the VS Code output
+# channel), so the spinner only draws on a real terminal.
+_is_tty = sys.stdout.isatty()
+
+def progress_tick():
+    """Advance the progress spinner by one streamed token.
+
+    Driven directly by the streaming loop instead of a polling thread, so
+    there are no timer wakeups and no GIL contention while tokens arrive.
+    Only every TICKS_PER_FRAME-th tick actually redraws the line.
+    """
+    global _tick_count
+    if not _is_tty:
+        return
+    _tick_count += 1
+    if _tick_count % TICKS_PER_FRAME:
+        return
+    frame = FRAMES[(_tick_count // TICKS_PER_FRAME) & 3]
+    sys.stdout.write(f"{frame} {_tick_count} tokens\r")
+    sys.stdout.flush()
+
+def progress_reset():
+    global _tick_count
+    _tick_count = 0